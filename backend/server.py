@@ -1,20 +1,27 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Depends, Request
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
+import re
+import asyncio
+import hashlib
 import logging
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, BeforeValidator
-from typing import Dict, List, Optional, Annotated
-from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict, BeforeValidator, TypeAdapter
+from typing import Dict, List, Optional, Annotated, Tuple
+from datetime import datetime, timezone
 import httpx
 from contextlib import asynccontextmanager
 import uuid
 import firebase_admin
 from firebase_admin import credentials, auth
 from bson import ObjectId
-from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -34,12 +41,16 @@ except Exception as e:
     logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware so timestamps read back from Mongo match the aware UTC values we write
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY')
 YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3"
+FRONTEND_ORIGINS = [origin.strip() for origin in os.environ.get('FRONTEND_ORIGINS', 'http://localhost:3000').split(',') if origin.strip()]
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
 
 # Custom Pydantic type for ObjectId compatibility with Pydantic v2
 def validate_object_id(v: any):
@@ -55,7 +66,7 @@ class User(BaseModel):
     email: str
     name: Optional[str] = None
     picture: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
 
 class Video(BaseModel):
     id: str
@@ -65,7 +76,9 @@ class Video(BaseModel):
     duration: Optional[int] = None
     published_at: str
 
-class Course(BaseModel):
+VIDEO_LIST_ADAPTER = TypeAdapter(List[Video])
+
+class CourseSummary(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     title: str
@@ -73,10 +86,18 @@ class Course(BaseModel):
     playlist_id: str
     playlist_url: str
     thumbnail_url: str
-    videos: List[Video]
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    video_count: int = 0
+    created_at: datetime = Field(default_factory=utc_now)
     model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True, json_encoders={ObjectId: str})
 
+# Videos live in the course_videos collection, keyed by (course_id, position)
+class Course(CourseSummary):
+    videos: List[Video]
+
+
+class CourseBundle(BaseModel):
+    course: Course
+    progress: Dict[str, dict]
 
 class CreateCourseRequest(BaseModel):
     playlist_url: str
@@ -92,7 +113,7 @@ class Progress(BaseModel):
     video_id: str
     watched: bool = False
     last_position: int = 0
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=utc_now)
     model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True, json_encoders={ObjectId: str})
 
 # New Pydantic models for request bodies
@@ -115,92 +136,282 @@ class Note(BaseModel):
     video_id: str
     content: str
     timestamp: int
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
     model_config = ConfigDict(json_encoders={ObjectId: str})
 
 class UpdateNoteRequest(BaseModel):
     content: str
 
-def extract_playlist_id(url: str) -> str:
-    if "list" in url:
-        return url.split("list=")[1].split("&")[0]
-    raise HTTPException(status_code=400, detail="Invalid YouTube playlist URL")
+PLAYLIST_ID_RE = re.compile(r"[?&#]list=([A-Za-z0-9_-]+)")
 
-async def get_playlist_details(playlist_id: str):
+def extract_playlist_id(url: str) -> str:
+    match = PLAYLIST_ID_RE.search(url)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid YouTube playlist URL")
+    return match.group(1)
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http
+
+async def youtube_get(client: httpx.AsyncClient, url: str, params: dict) -> dict:
+    # Fail loudly so a partial playlist walk never reaches the shared playlist cache
+    response = await client.get(url, params=params)
+    if response.status_code == 404:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    if response.is_error:
+        logger.error(f"YouTube API request to {url} failed with {response.status_code}: {response.text}")
+        raise HTTPException(status_code=502, detail="YouTube API request failed")
+    return response.json()
+
+async def get_playlist_details(client: httpx.AsyncClient, playlist_id: str):
     url = f"{YOUTUBE_API_BASE}/playlists"
     params = {
-        "part": "snippet,contentDetails",
+        "part": "snippet",
         "id": playlist_id,
+        "fields": "items(snippet(title,description,thumbnails(high/url,default/url)))",
         "key": YOUTUBE_API_KEY
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
-        data = response.json()
-        if not data.get("items"):
-            raise HTTPException(status_code=404, detail="Playlist not found")
-        return data["items"][0]
-
-async def get_playlist_videos(playlist_id: str):
-    videos = []
-    next_page_token = None
-    while True:
-        url = f"{YOUTUBE_API_BASE}/playlistItems"
-        params = {
-            "part": "snippet,contentDetails",
-            "playlistId": playlist_id,
-            "key": YOUTUBE_API_KEY,
-            "maxResults": 50
-        }
-        if next_page_token:
-            params["pageToken"] = next_page_token
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            data = response.json()
-        for item in data.get("items", []):
-            snippet = item["snippet"]
-            thumbnails = snippet["thumbnails"]
-            thumbnail_url = thumbnails.get("high", thumbnails.get("default", {})).get("url", "")
-            video = Video(
-                id=snippet["resourceId"]["videoId"],
-                title=snippet["title"],
-                description=snippet["description"],
-                thumbnail_url=thumbnail_url,
-                published_at=snippet["publishedAt"]
-            )
-            videos.append(video)
-        next_page_token = data.get("nextPageToken")
-        if not next_page_token:
-            break
-    return videos
+    data = await youtube_get(client, url, params)
+    if not data.get("items"):
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    return data["items"][0]
+
+async def get_playlist_items_page(client: httpx.AsyncClient, playlist_id: str, page_token: Optional[str] = None):
+    url = f"{YOUTUBE_API_BASE}/playlistItems"
+    params = {
+        "part": "snippet",
+        "playlistId": playlist_id,
+        "fields": "nextPageToken,items(snippet(title,description,publishedAt,resourceId/videoId,thumbnails(high/url,default/url)))",
+        "key": YOUTUBE_API_KEY,
+        "maxResults": 50
+    }
+    if page_token:
+        params["pageToken"] = page_token
+    return await youtube_get(client, url, params)
+
+async def iter_playlist_videos(client: httpx.AsyncClient, playlist_id: str):
+    page = asyncio.create_task(get_playlist_items_page(client, playlist_id))
+    try:
+        while page is not None:
+            data = await page
+            next_page_token = data.get("nextPageToken")
+            # Request the next page before handing out this one so the fetch overlaps with the consumer
+            page = asyncio.create_task(get_playlist_items_page(client, playlist_id, next_page_token)) if next_page_token else None
+            raw_videos = []
+            for item in data.get("items", []):
+                snippet = item["snippet"]
+                thumbnails = snippet["thumbnails"]
+                raw_videos.append({
+                    "id": snippet["resourceId"]["videoId"],
+                    "title": snippet["title"],
+                    "description": snippet["description"],
+                    "thumbnail_url": thumbnails.get("high", thumbnails.get("default", {})).get("url", ""),
+                    "published_at": snippet["publishedAt"],
+                })
+            # Validate the whole page in one pydantic-core call
+            for video in VIDEO_LIST_ADAPTER.validate_python(raw_videos):
+                yield video
+    finally:
+        if page is not None:
+            page.cancel()
+
+async def get_playlist_videos(client: httpx.AsyncClient, playlist_id: str) -> List[Video]:
+    return [video async for video in iter_playlist_videos(client, playlist_id)]
+
+async def get_course_videos(course_data: dict) -> List[dict]:
+    # Courses created before videos moved out of the course document still embed them
+    if "videos" in course_data:
+        return course_data["videos"]
+    return await db.course_videos.find(
+        {"course_id": course_data["id"]},
+        {"_id": 0, "course_id": 0, "user_id": 0, "position": 0}
+    ).sort("position", 1).to_list(None)
+
+async def load_course(course_data: dict) -> dict:
+    # Returned as a plain dict: response_model=Course validates it once on the way out
+    videos = await get_course_videos(course_data)
+    return {**course_data, "videos": videos, "video_count": len(videos)}
+
+async def load_owned_course(user_id: str, course_id: str) -> Optional[dict]:
+    course_data = await db.courses.find_one({"id": course_id, "user_id": user_id})
+    return await load_course(course_data) if course_data else None
+
+PLAYLIST_CACHE_TTL = 3600
+PLAYLIST_CACHE_MAX_SIZE = 4096
+# playlist_id -> (expires_at, playlist details, videos)
+_playlist_cache: Dict[str, Tuple[float, dict, List[Video]]] = {}
+# playlist_id -> fetch in progress, shared by concurrent requests for the same playlist
+_playlist_inflight: Dict[str, asyncio.Task] = {}
+
+async def load_playlist(client: httpx.AsyncClient, playlist_id: str) -> Tuple[dict, List[Video]]:
+    # Page tokens are opaque, so the item pages stay sequential; the metadata
+    # lookup is independent and overlaps with them.
+    playlist_details, videos = await asyncio.gather(
+        get_playlist_details(client, playlist_id),
+        get_playlist_videos(client, playlist_id),
+    )
+    if len(_playlist_cache) >= PLAYLIST_CACHE_MAX_SIZE:
+        _playlist_cache.pop(next(iter(_playlist_cache)))
+    _playlist_cache[playlist_id] = (time.monotonic() + PLAYLIST_CACHE_TTL, playlist_details, videos)
+    return playlist_details, videos
+
+async def fetch_playlist(client: httpx.AsyncClient, playlist_id: str) -> Tuple[dict, List[Video]]:
+    cached = _playlist_cache.get(playlist_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1], cached[2]
+    task = _playlist_inflight.get(playlist_id)
+    if task is None:
+        task = asyncio.create_task(load_playlist(client, playlist_id))
+        _playlist_inflight[playlist_id] = task
+        task.add_done_callback(lambda _: _playlist_inflight.pop(playlist_id, None))
+    # Shielded so one caller disconnecting does not cancel the fetch for the others
+    return await asyncio.shield(task)
+
+def find_video_notes(user_id: str, video_id: str):
+    # Trusted reads: project away fields the client already has and skip re-validation
+    return db.notes.find(
+        {"user_id": user_id, "video_id": video_id},
+        {"_id": 0, "user_id": 0, "course_id": 0}
+    ).sort("timestamp", 1).batch_size(500)
+
+#--- Progress write coalescing
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get('PROGRESS_FLUSH_INTERVAL', '0.25'))
+if PROGRESS_FLUSH_INTERVAL <= 0:
+    raise ValueError(f"PROGRESS_FLUSH_INTERVAL must be a positive number of seconds, got {PROGRESS_FLUSH_INTERVAL}")
+# (user_id, course_id, video_id) -> latest progress document, written out by flush_progress.
+# The buffer is per process: read-your-writes on GET /progress only holds with a single worker.
+_pending_progress: Dict[Tuple[str, str, str], dict] = {}
+# Snapshot being written by the current flush; still overlaid on reads until bulk_write returns
+_flushing_progress: Dict[Tuple[str, str, str], dict] = {}
+# Serializes flushes with discard_progress; created in lifespan so it binds to the serving loop
+_progress_lock: Optional[asyncio.Lock] = None
+
+async def flush_progress():
+    global _pending_progress, _flushing_progress
+    async with _progress_lock:
+        if not _pending_progress:
+            return
+        snapshot, _pending_progress = _pending_progress, {}
+        _flushing_progress = snapshot
+        try:
+            # Drop updates for courses deleted since they were buffered (also by other workers)
+            owners = {(user_id, course_id) for user_id, course_id, _ in snapshot}
+            live_courses = {(course["user_id"], course["id"]) async for course in db.courses.find(
+                {"$or": [{"user_id": user_id, "id": course_id} for user_id, course_id in owners]},
+                {"_id": 0, "user_id": 1, "id": 1}
+            )}
+            updates = [
+                UpdateOne({"user_id": user_id, "course_id": course_id, "video_id": video_id}, {"$set": data}, upsert=True)
+                for (user_id, course_id, video_id), data in snapshot.items()
+                if (user_id, course_id) in live_courses
+            ]
+            if updates:
+                await db.progress.bulk_write(updates, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to flush progress updates: {e}")
+            # Retry on the next tick unless a newer update for the same video has arrived;
+            # the retry re-checks that each course still exists
+            for key, data in snapshot.items():
+                _pending_progress.setdefault(key, data)
+        finally:
+            _flushing_progress = {}
+
+async def discard_progress(user_id: str, course_id: Optional[str] = None):
+    # Call after the course documents are deleted. Holding the flush lock means no flush
+    # can have checked the course and still be about to upsert once the rows are gone.
+    progress_filter = {"user_id": user_id}
+    if course_id is not None:
+        progress_filter["course_id"] = course_id
+    async with _progress_lock:
+        for key in [key for key in _pending_progress if key[0] == user_id and course_id in (None, key[1])]:
+            del _pending_progress[key]
+        await db.progress.delete_many(progress_filter)
+
+async def progress_flusher(stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), PROGRESS_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        await flush_progress()
 
 #--- Firebase-specific backend logic
+TOKEN_CACHE_MAX_SIZE = 10_000
+# sha256(token) -> (exp, decoded claims)
+_token_cache: Dict[bytes, Tuple[float, dict]] = {}
+
+async def verify_id_token_cached(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    cached = _token_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    # verify_id_token is blocking (RSA verify, occasional cert fetch); keep it off the event loop
+    decoded_token = await asyncio.get_running_loop().run_in_executor(None, auth.verify_id_token, token)
+    if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+        for expired in [k for k, (exp, _) in _token_cache.items() if exp <= now]:
+            del _token_cache[expired]
+        if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+            _token_cache.pop(next(iter(_token_cache)))
+    _token_cache[key] = (decoded_token["exp"], decoded_token)
+    return decoded_token
+
+USER_CACHE_TTL = 60
+USER_CACHE_MAX_SIZE = 10_000
+# uid -> (expires_at, User); users are never modified after provisioning
+_user_cache: Dict[str, Tuple[float, User]] = {}
+
 async def get_current_user_firebase(id_token: str = Header(None, alias="Authorization")):
     if not id_token or not id_token.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Bearer token required")
     token = id_token.split(" ")[1]
     try:
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await verify_id_token_cached(token)
         user_id = decoded_token['uid']
+        cached = _user_cache.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
         user_email = decoded_token['email']
         user_name = decoded_token.get('name')
         user_picture = decoded_token.get('picture')
-        db_user = await db.users.find_one({"id": user_id})
-        if not db_user:
-            new_user = User(
-                id=user_id,
-                email=user_email,
-                name=user_name,
-                picture=user_picture,
-            )
-            await db.users.insert_one(new_user.dict())
-            db_user = new_user.dict()
-        return User(**db_user)
+        db_user = await db.users.find_one_and_update(
+            {"id": user_id},
+            {"$setOnInsert": {
+                "email": user_email,
+                "name": user_name,
+                "picture": user_picture,
+                "created_at": utc_now(),
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        user = User(**db_user)
+        if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+            _user_cache.pop(next(iter(_user_cache)))
+        _user_cache[user_id] = (time.monotonic() + USER_CACHE_TTL, user)
+        return user
     except auth.InvalidIdTokenError:
         raise HTTPException(status_code=401, detail="Invalid authentication token")
     except Exception as e:
         logger.error(f"Error during Firebase token verification: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def concurrency_limit(max_in_flight: int):
+    # Per-process guard; each worker enforces its own limit
+    in_flight: Dict[str, int] = {}
+
+    async def limiter(current_user: User = Depends(get_current_user_firebase)):
+        if in_flight.get(current_user.id, 0) >= max_in_flight:
+            raise HTTPException(status_code=429, detail="Too many concurrent requests")
+        in_flight[current_user.id] = in_flight.get(current_user.id, 0) + 1
+        try:
+            yield
+        finally:
+            in_flight[current_user.id] -= 1
+            if not in_flight[current_user.id]:
+                del in_flight[current_user.id]
+    return limiter
+
 @api_router.post("/auth/login")
 async def firebase_login(current_user: User = Depends(get_current_user_firebase)):
     return {"message": "Login successful", "user": current_user}
@@ -209,12 +420,11 @@ async def firebase_login(current_user: User = Depends(get_current_user_firebase)
 async def get_profile(current_user: User = Depends(get_current_user_firebase)):
     return {"user": current_user}
 
-@api_router.post("/courses", response_model=Course)
-async def create_course(request: CreateCourseRequest, current_user: User = Depends(get_current_user_firebase)):
+@api_router.post("/courses", response_model=Course, dependencies=[Depends(concurrency_limit(2))])
+async def create_course(request: CreateCourseRequest, current_user: User = Depends(get_current_user_firebase), http: httpx.AsyncClient = Depends(get_http_client)):
     playlist_id = extract_playlist_id(request.playlist_url)
-    playlist_details = await get_playlist_details(playlist_id)
+    playlist_details, videos = await fetch_playlist(http, playlist_id)
     snippet = playlist_details["snippet"]
-    videos = await get_playlist_videos(playlist_id)
     course = Course(
         user_id=current_user.id,
         title=snippet["title"],
@@ -222,52 +432,86 @@ async def create_course(request: CreateCourseRequest, current_user: User = Depen
         playlist_id=playlist_id,
         playlist_url=request.playlist_url,
         thumbnail_url=snippet["thumbnails"].get("high", snippet["thumbnails"].get("default", {}))["url"],
+        video_count=len(videos),
         videos=videos
     )
-    await db.courses.insert_one(jsonable_encoder(course, by_alias=False))
+    if videos:
+        await db.course_videos.insert_many([
+            {"course_id": course.id, "user_id": current_user.id, "position": position, **video.model_dump()}
+            for position, video in enumerate(videos)
+        ])
+    await db.courses.insert_one(course.model_dump(exclude={"videos"}))
     return course
 
 @api_router.put("/courses/{course_id}", response_model=Course)
 async def update_course(course_id: str, request: UpdateCourseRequest, current_user: User = Depends(get_current_user_firebase)):
-    course_to_update = await db.courses.find_one({"id": course_id, "user_id": current_user.id})
-    if not course_to_update:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    update_data = {k: v for k, v in request.dict().items() if v is not None}
+    owned_course = {"id": course_id, "user_id": current_user.id}
+    update_data = request.model_dump(exclude_none=True)
     if update_data:
-        await db.courses.update_one(
-            {"id": course_id},
-            {"$set": update_data}
+        updated_course = await db.courses.find_one_and_update(
+            owned_course,
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
-    
-    updated_course = await db.courses.find_one({"id": course_id})
-    return Course(**updated_course)
+    else:
+        updated_course = await db.courses.find_one(owned_course)
+    if not updated_course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return await load_course(updated_course)
 
-@api_router.get("/courses", response_model=List[Course])
+@api_router.get("/courses", response_model=None, responses={200: {"model": List[CourseSummary]}})
 async def get_user_courses(current_user: User = Depends(get_current_user_firebase)):
-    courses_data = await db.courses.find({"user_id": current_user.id}).to_list(100)
-    return [Course(**course) for course in courses_data]
+    courses_data = await db.courses.aggregate([
+        {"$match": {"user_id": current_user.id}},
+        {"$limit": 100},
+        {"$addFields": {"video_count": {"$ifNull": ["$video_count", {"$size": {"$ifNull": ["$videos", []]}}]}}},
+        {"$project": {"_id": 0, "videos": 0}},
+    ]).to_list(100)
+    # Our own documents already have the CourseSummary shape; serialize them without re-validating
+    return ORJSONResponse(courses_data)
 
 @api_router.get("/courses/{course_id}", response_model=Course)
 async def get_course(course_id: str, current_user: User = Depends(get_current_user_firebase)):
     course_data = await db.courses.find_one({"id": course_id, "user_id": current_user.id})
     if not course_data:
         raise HTTPException(status_code=404, detail="Course not found")
-    return Course(**course_data)
+    return await load_course(course_data)
+
+@api_router.get("/courses/{course_id}/bundle", response_model=CourseBundle)
+async def get_course_bundle(course_id: str, current_user: User = Depends(get_current_user_firebase)):
+    # Everything the course page needs on load in one request; the course (with its videos)
+    # and progress reads run concurrently
+    course, progress = await asyncio.gather(
+        load_owned_course(current_user.id, course_id),
+        load_course_progress(current_user.id, course_id),
+    )
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return {"course": course, "progress": progress}
 
 @api_router.delete("/courses/{course_id}")
 async def delete_course(course_id: str, current_user: User = Depends(get_current_user_firebase)):
-    course = await db.courses.find_one({"id": course_id, "user_id": current_user.id})
-    if not course:
+    result = await db.courses.delete_one({"id": course_id, "user_id": current_user.id})
+    if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Course not found")
-    await db.courses.delete_one({"id": course_id})
-    await db.progress.delete_many({"course_id": course_id})
+    child_filter = {"course_id": course_id, "user_id": current_user.id}
+    await asyncio.gather(
+        db.course_videos.delete_many(child_filter),
+        db.notes.delete_many(child_filter),
+        discard_progress(current_user.id, course_id),
+    )
     return {"message": "Course deleted successfully"}
 
 @api_router.delete("/delete-all-courses")
 async def delete_all_courses(current_user: User = Depends(get_current_user_firebase)):
-    await db.courses.delete_many({"user_id": current_user.id})
-    await db.progress.delete_many({"user_id": current_user.id})
+    user_filter = {"user_id": current_user.id}
+    # Courses go first so pending progress flushes see them as deleted
+    await db.courses.delete_many(user_filter)
+    await asyncio.gather(
+        db.course_videos.delete_many(user_filter),
+        db.notes.delete_many(user_filter),
+        discard_progress(current_user.id),
+    )
     return {"message": "All courses and progress deleted successfully"}
 
 @api_router.post("/progress", response_model=Progress)
@@ -278,48 +522,55 @@ async def update_progress(request: UpdateProgressRequest, current_user: User = D
         "video_id": request.video_id,
         "watched": request.watched,
         "last_position": request.last_position,
-        "updated_at": datetime.utcnow()
+        "updated_at": utc_now()
     }
-    await db.progress.update_one(
-        {"user_id": current_user.id, "course_id": request.course_id, "video_id": request.video_id},
-        {"$set": progress_data},
-        upsert=True
-    )
-    # Return the updated progress document
-    updated_progress = await db.progress.find_one({"user_id": current_user.id, "course_id": request.course_id, "video_id": request.video_id})
-    return Progress(**updated_progress)
-
-@api_router.get("/progress/{course_id}", response_model=Dict[str, Progress])
+    # Player heartbeats are buffered and written in batches by progress_flusher
+    _pending_progress[(current_user.id, request.course_id, request.video_id)] = progress_data
+    return Progress(**progress_data)
+
+async def load_course_progress(user_id: str, course_id: str) -> dict:
+    # Capture updates not yet in Mongo before querying: a flush finishing during the query
+    # then either shows up in the query result or is still covered by this overlay.
+    # The in-flight snapshot goes first so newer buffered updates win.
+    unflushed = {
+        video_id: {k: v for k, v in data.items() if k not in ("user_id", "course_id")}
+        for buffer in (_flushing_progress, _pending_progress)
+        for (pending_user_id, pending_course_id, video_id), data in buffer.items()
+        if pending_user_id == user_id and pending_course_id == course_id
+    }
+    # One large batch avoids the getMore round-trips after Mongo's default 101-document first batch
+    cursor = db.progress.find(
+        {"user_id": user_id, "course_id": course_id},
+        {"_id": 0, "video_id": 1, "watched": 1, "last_position": 1, "updated_at": 1}
+    ).batch_size(1000)
+    progress = {item["video_id"]: item async for item in cursor}
+    progress.update(unflushed)
+    return progress
+
+@api_router.get("/progress/{course_id}")
 async def get_course_progress(course_id: str, current_user: User = Depends(get_current_user_firebase)):
-    progress_data = await db.progress.find({"user_id": current_user.id, "course_id": course_id}).to_list(1000)
-    return {item["video_id"]: Progress(**item) for item in progress_data}
+    return await load_course_progress(current_user.id, course_id)
 
 @api_router.post("/notes", response_model=Note)
 async def create_note(request: AddNoteRequest, current_user: User = Depends(get_current_user_firebase)):
     note = Note(user_id=current_user.id, course_id=request.course_id, video_id=request.video_id, content=request.content, timestamp=request.timestamp)
-    await db.notes.insert_one(note.dict())
+    await db.notes.insert_one(note.model_dump())
     return note
 
 @api_router.put("/notes/{note_id}", response_model=Note)
 async def update_note(note_id: str, request: UpdateNoteRequest, current_user: User = Depends(get_current_user_firebase)):
-    note_to_update = await db.notes.find_one({"id": note_id, "user_id": current_user.id})
-    if not note_to_update:
-        raise HTTPException(status_code=404, detail="Note not found")
-    
-    update_data = {k: v for k, v in request.dict().items() if v is not None}
-    
-    await db.notes.update_one(
-        {"id": note_id},
-        {"$set": update_data}
+    updated_note = await db.notes.find_one_and_update(
+        {"id": note_id, "user_id": current_user.id},
+        {"$set": {"content": request.content}},
+        return_document=ReturnDocument.AFTER
     )
-    
-    updated_note = await db.notes.find_one({"id": note_id})
-    return Note(**updated_note)
+    if not updated_note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return updated_note
 
-@api_router.get("/notes/{video_id}", response_model=List[Note])
+@api_router.get("/notes/{video_id}")
 async def get_video_notes(video_id: str, current_user: User = Depends(get_current_user_firebase)):
-    notes_data = await db.notes.find({"user_id": current_user.id, "video_id": video_id}).sort("timestamp", 1).to_list(1000)
-    return [Note(**note) for note in notes_data]
+    return [note async for note in find_video_notes(current_user.id, video_id)]
 
 @api_router.delete("/notes/{note_id}")
 async def delete_note(note_id: str, current_user: User = Depends(get_current_user_firebase)):
@@ -336,17 +587,62 @@ async def root():
 async def test_endpoint():
     return {"message": "API is working!", "youtube_api_configured": bool(YOUTUBE_API_KEY)}
 
+async def create_unique_index(collection, keys):
+    # Older deployments may hold duplicates from the former find-then-insert and
+    # un-indexed upserts; keep serving and ask for a cleanup instead of failing startup.
+    try:
+        await collection.create_index(keys, unique=True)
+    except DuplicateKeyError as e:
+        logger.error(f"Duplicate documents in '{collection.name}' prevent a unique index on {keys}; "
+                     f"remove the duplicates and restart to create it: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await create_unique_index(db.users, "id")
+    await create_unique_index(db.courses, [("user_id", 1), ("id", 1)])
+    await db.course_videos.create_index([("course_id", 1), ("position", 1)])
+    await db.course_videos.create_index("user_id")
+    await db.notes.create_index([("user_id", 1), ("video_id", 1), ("timestamp", 1)])
+    await db.notes.create_index([("user_id", 1), ("id", 1)])
+    await db.notes.create_index([("user_id", 1), ("course_id", 1)])
+    await create_unique_index(db.progress, [("user_id", 1), ("course_id", 1), ("video_id", 1)])
+    # One pooled client for all YouTube calls so pages reuse keep-alive connections
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30),
+    )
+    global _progress_lock
+    _progress_lock = asyncio.Lock()
+    stop_flusher = asyncio.Event()
+    flusher = asyncio.create_task(progress_flusher(stop_flusher))
     yield
+    # The flusher drains the buffer once more before exiting
+    stop_flusher.set()
+    await flusher
+    await app.state.http.aclose()
     client.close()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.include_router(api_router)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
\ No newline at end of file
+    allow_origins=FRONTEND_ORIGINS,
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    # "auto" resolves to uvloop and httptools, which requirements.txt installs
+    # (uvloop is unavailable on Windows, where this falls back to asyncio).
+    # One worker by default: the progress buffer and caches are per process.
+    uvicorn.run(
+        "server:app",
+        loop="auto",
+        http="auto",
+        workers=int(os.environ.get("WEB_CONCURRENCY", 1)),
+    )
@@ -237,7 +237,7 @@ const Dashboard = () => {
                     const completedVideos = Object.values(progressData).filter(p => p.watched).length;
                     return {
                         ...course,
-                        progress: (completedVideos / course.videos.length) * 100 || 0,
+                        progress: (completedVideos / course.video_count) * 100 || 0,
                     };
                 })
             );
@@ -38,8 +38,7 @@ const CourseDetails = ({ setCourseProgress, setVideoProgress }) => {
 
     useEffect(() => {
         if (idToken) {
-            fetchCourseDetails();
-            fetchCourseProgress();
+            fetchCourse();
         }
     }, [courseId, idToken]);
 
@@ -56,41 +55,27 @@ const CourseDetails = ({ setCourseProgress, setVideoProgress }) => {
         }
     }, [selectedVideo, progress, isPlayerReady]);
 
-    const fetchCourseDetails = async () => {
+    const fetchCourse = async () => {
         try {
-            const response = await axios.get(`${API}/courses/${courseId}`, {
+            const response = await axios.get(`${API}/courses/${courseId}/bundle`, {
                 headers: { 'Authorization': `Bearer ${idToken}` }
             });
-            const courseData = response.data;
+            const { course: courseData, progress: newProgress } = response.data;
             setCourse(courseData);
             setNewTitle(courseData.title);
             setNewDescription(courseData.description);
-        } catch (error) {
-            console.error('Error fetching course details:', error);
-            navigate('/');
-        } finally {
-            setLoading(false);
-        }
-    };
-
-    const fetchCourseProgress = async () => {
-        try {
-            const response = await axios.get(`${API}/progress/${courseId}`, {
-                headers: { 'Authorization': `Bearer ${idToken}` }
-            });
-            const newProgress = response.data;
             setProgress(newProgress);
-            const courseDetailsResponse = await axios.get(`${API}/courses/${courseId}`, {
-                headers: { 'Authorization': `Bearer ${idToken}` }
-            });
-            const totalVideos = courseDetailsResponse.data.videos.length;
+            const totalVideos = courseData.videos.length;
             const completedVideos = Object.values(newProgress).filter(p => p.watched).length;
             const courseCompletion = (completedVideos / totalVideos) * 100 || 0;
             setCourseProgress(courseCompletion);
-            const videoToSelect = courseDetailsResponse.data.videos.find(v => newProgress[v.id]?.last_position > 0) || courseDetailsResponse.data.videos[0];
+            const videoToSelect = courseData.videos.find(v => newProgress[v.id]?.last_position > 0) || courseData.videos[0];
             setSelectedVideo(videoToSelect);
         } catch (error) {
-            console.error('Error fetching course progress:', error);
+            console.error('Error fetching course details:', error);
+            navigate('/');
+        } finally {
+            setLoading(false);
         }
     };
 